@@ -1,30 +1,246 @@
 import os
+import sys
+import json
+import time
+import logging
 import ads
-from typing import List, Tuple, Iterable
+from ads.base import APIResponseError
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, KeysView, List, Set, Tuple, Iterable
 from difflib import SequenceMatcher
-from igraph import Graph
+from functools import lru_cache
 from configparser import ConfigParser
-from collections import namedtuple
-from sqlalchemy import Table, Column, Integer, String, Float, MetaData, create_engine
-from sqlalchemy.sql import select
+from collections import Counter, defaultdict, namedtuple
+from itertools import chain, combinations
+from sqlalchemy import Table, Column, Index, Integer, String, Float, Text, MetaData, create_engine, inspect
+from sqlalchemy.sql import bindparam, func, select
 from tqdm import tqdm
 
+if TYPE_CHECKING:
+    from igraph import Graph
+
+logger = logging.getLogger(__name__)
+
 # Load API token from configuration file (or env variable for testing)
 home_dir = os.path.expanduser('~')
 conf_dir_path = os.path.join(home_dir, '.ads2gephi')
 conf_file_path = os.path.join(conf_dir_path, 'ads2gephi.cfg')
-if os.path.isfile(conf_file_path):
+
+
+def load_config(path: str) -> ConfigParser:
+    """
+    Parse a configuration file. The result is cached, so the module
+    and the CLI share one parse of the same file. The cache is keyed
+    by modification time and size, so an edited file is parsed again.
+    :param path: Path of the configuration file
+    """
+    stat = os.stat(path)
+    return _load_config(path, stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=None)
+def _load_config(path: str, mtime_ns: int, size: int) -> ConfigParser:
+    """
+    Cached implementation of load_config
+    """
     config = ConfigParser()
-    config.read_file(open(conf_file_path))
-    ADS_API_KEY = config['ads_api']['APIKey']
-else:
+    config.read(path, encoding='utf-8')
+    return config
+
+
+try:
+    ADS_API_KEY = load_config(conf_file_path)['ads_api']['APIKey']
+except FileNotFoundError:
     ADS_API_KEY = os.environ.get('ADS_API_KEY')
 
+ADS_FIELDS = ['bibcode', 'year', 'author', 'title', 'reference', 'citation']
+# Number of ADS queries which are allowed to run concurrently while sampling
+ADS_MAX_WORKERS = 16
+# Number of attempts for a single ADS query before giving up
+ADS_MAX_RETRIES = 3
+# Number of bibcodes which are OR-ed together into a single ADS query
+ADS_QUERY_CHUNK_SIZE = 100
+# Number of bibcodes posted to a single ADS bigquery, which returns at most 2000 rows
+ADS_BIGQUERY_CHUNK_SIZE = 2000
+# Bigqueries have a much lower daily rate limit, so only use them for long lists of bibcodes
+ADS_BIGQUERY_MIN_SIZE = 1000
+# Number of seconds after which a cached ADS response is queried again
+ADS_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+# Number of values bound to a single IN (...) clause, below SQLite's limit of 999 variables
+SQLITE_IN_CHUNK_SIZE = 900
+# Stands in for ads.search.Article when rebuilding nodes from the db
+ArticleStub = namedtuple('ArticleStub', ['bibcode', 'title', 'year', 'author', 'citation', 'reference'])
+
+
+def _query_with_retries(query: Callable, description: str):
+    """
+    Run an ADS query. Failed requests (e.g. because the rate limit
+    was hit) are retried with exponential backoff.
+    :param query: Function sending the request and returning its result
+    :param description: What is queried, used for logging
+    """
+    for attempt in range(ADS_MAX_RETRIES):
+        try:
+            return query()
+        except APIResponseError as error:
+            if attempt == ADS_MAX_RETRIES - 1:
+                raise
+            logger.debug('ADS query for %s failed, retrying in %d s: %s', description, 2 ** attempt, error)
+            time.sleep(2 ** attempt)
+
+
+def query_article(bibcode: str) -> ads.search.Article:
+    """
+    Query a single article from ADS
+    :param bibcode: A bibcode to be queried from ADS
+    """
+    return _query_with_retries(
+        lambda: ads.SearchQuery(bibcode=bibcode, token=ADS_API_KEY, fl=ADS_FIELDS).next(),
+        bibcode
+    )
+
+
+def query_article_chunk(bibcodes: List[str]) -> Dict[str, ads.search.Article]:
+    """
+    Query several articles from ADS with a single request by OR-ing their bibcodes
+    :param bibcodes: At most ADS_QUERY_CHUNK_SIZE bibcodes to be queried from ADS
+    :return: Dict mapping the bibcodes found in ADS to their article. Bibcodes
+             which ADS only knows as an alternate bibcode are missing.
+    """
+    query = 'bibcode:({})'.format(' OR '.join(f'"{bibcode}"' for bibcode in bibcodes))
+    articles = _query_with_retries(
+        lambda: list(ads.SearchQuery(q=query, token=ADS_API_KEY, fl=ADS_FIELDS, rows=len(bibcodes))),
+        f'{len(bibcodes)} bibcodes'
+    )
+    return {article.bibcode: article for article in articles}
+
+
+def query_article_bigquery(bibcodes: List[str]) -> Dict[str, ads.search.Article]:
+    """
+    Query several articles from ADS with a single bigquery, which posts the bibcodes
+    as a list instead of putting them into the query string
+    :param bibcodes: At most ADS_BIGQUERY_CHUNK_SIZE bibcodes to be queried from ADS
+    :return: Dict mapping the bibcodes found in ADS to their article. Bibcodes
+             which ADS only knows as an alternate bibcode are missing.
+    """
+    request = ads.base.BaseQuery()
+    if ADS_API_KEY:
+        request.token = ADS_API_KEY
+    response = _query_with_retries(
+        lambda: ads.search.SolrResponse.load_http_response(request.session.post(
+            ads.config.BIGQUERY_URL,
+            params={'q': '*:*', 'fl': ','.join(ADS_FIELDS), 'rows': len(bibcodes)},
+            headers={'Content-Type': 'big-query/csv'},
+            data='bibcode\n' + '\n'.join(bibcodes)
+        )),
+        f'{len(bibcodes)} bibcodes'
+    )
+    return {article.bibcode: article for article in response.articles}
+
+
+def query_articles(bibcodes: List[str], progress: bool = True) -> Dict[str, ads.search.Article]:
+    """
+    Query articles from ADS in chunks, with several chunks in flight at once,
+    since sampling is bound by the latency of the requests. Long lists are
+    posted as bigqueries, shorter ones are sent as OR-ed bibcodes. Bibcodes
+    missing from a chunk's response (e.g. alternate bibcodes) are queried
+    one by one.
+    :param bibcodes: Bibcodes to be queried from ADS
+    :param progress: Show a progress bar, as long as stderr is a terminal
+    :return: Dict mapping the given bibcodes to their article
+    """
+    bibcodes = list(dict.fromkeys(bibcodes))
+    if len(bibcodes) >= ADS_BIGQUERY_MIN_SIZE:
+        chunk_size, query_chunk = ADS_BIGQUERY_CHUNK_SIZE, query_article_bigquery
+    else:
+        chunk_size, query_chunk = ADS_QUERY_CHUNK_SIZE, query_article_chunk
+    bibcode_chunks = [
+        bibcodes[start:start + chunk_size]
+        for start in range(0, len(bibcodes), chunk_size)
+    ]
+    articles = {}
+    with ThreadPoolExecutor(max_workers=ADS_MAX_WORKERS) as executor, \
+            tqdm(total=len(bibcodes), desc='Querying ADS',
+                 disable=not (progress and bibcodes and sys.stderr.isatty())) as progress_bar:
+        for bibcodes_chunk, chunk_articles in zip(bibcode_chunks, executor.map(query_chunk, bibcode_chunks)):
+            articles.update(
+                (bibcode, chunk_articles[bibcode]) for bibcode in bibcodes_chunk if bibcode in chunk_articles
+            )
+            progress_bar.update(len(bibcodes_chunk))
+        unmatched_bibcodes = [bibcode for bibcode in bibcodes if bibcode not in articles]
+        articles.update(zip(unmatched_bibcodes, executor.map(query_article, unmatched_bibcodes)))
+    return articles
+
+
+def sqlite_chunks(values: List) -> Iterable[List]:
+    """
+    Split a list of values into chunks which can be bound to a single SQLite IN (...) clause
+    :param values:
+    """
+    for start in range(0, len(values), SQLITE_IN_CHUNK_SIZE):
+        yield values[start:start + SQLITE_IN_CHUNK_SIZE]
+
+
+def split_bibcodes(joined_bibcodes: str) -> List[str]:
+    """
+    Split a '; ' separated db column into interned bibcodes.
+    The same bibcodes are referenced by many nodes, so interning
+    lets them share one string object and speeds up dict/set lookups.
+    :param joined_bibcodes:
+    :return: List of bibcodes, empty for an empty column
+    """
+    if not joined_bibcodes:
+        return []
+    return [sys.intern(bibcode) for bibcode in joined_bibcodes.split('; ')]
+
+
+@lru_cache(maxsize=None)
+def _split_name(name: str) -> Tuple[str, str]:
+    """
+    Split an author name as 'Last, First' into its last name and first initial.
+    Memoized, since every author appears in many pairs to be compared.
+    :param name:
+    """
+    last, first = tuple(name.split(', '))
+    return last, first[0]
+
+
+@lru_cache(maxsize=None)
+def _author_is_same(name_1: str, name_2: str) -> bool:
+    """
+    Memoized implementation of CitationNetwork.author_is_same
+    """
+    name1_last, name1_initial = _split_name(name_1)
+    name2_last, name2_initial = _split_name(name_2)
+    if name1_initial != name2_initial:
+        return False
+    if name1_last == name2_last:
+        return True
+    # The ratio of the last names is at most 2 * shorter / (len1 + len2),
+    # skip the fuzzy comparison if that can't reach the threshold below
+    name1_len, name2_len = len(name1_last), len(name2_last)
+    if 18 * min(name1_len, name2_len) < 7 * (name1_len + name2_len):
+        return False
+    # The initials are equal at this point, so their ratio is always 1.0
+    matcher = SequenceMatcher(None, name1_last, name2_last)
+    # quick_ratio() is a cheap upper bound of ratio(), based on the shared characters
+    if (1.0 + matcher.quick_ratio() * 9) / 10.0 <= 0.80:
+        return False
+    score = (
+         1.0 +
+         matcher.ratio() * 9
+    ) / 10.0
+    if score > 0.80:
+        return True
+    return False
+
 
 class Node:
     """
     A node representing a single publication in the citation network
     """
+    # Networks hold many nodes, slots spare each of them a __dict__
+    __slots__ = ('_article', '_modularity_id', 'judgement', '_authors', '_title')
 
     def __init__(self, bibcode: str = None, db_article: ads.search.Article = None, judgement: bool = False):
         """
@@ -35,14 +251,23 @@ class Node:
         if db_article:
             self._article = db_article
         elif bibcode:
-            _query = ads.SearchQuery(
-                bibcode=bibcode,
-                token=ADS_API_KEY,
-                fl=['bibcode', 'year', 'author', 'title', 'reference', 'citation']
-            )
-            self._article = _query.next()
-            self._modularity_id: int = 0
+            self._article = query_article(bibcode)
+        self._modularity_id: int = 0
         self.judgement = judgement
+        # Joined strings, built on first access since they are only needed for writing
+        self._authors: str = None
+        self._title: str = None
+
+    @staticmethod
+    def fetch_many(bibcodes: List[str], judgement: bool = False) -> List['Node']:
+        """
+        Create nodes for several bibcodes, querying ADS in chunks of OR-ed bibcodes
+        :param bibcodes: Bibcodes to be queried from ADS
+        :param judgement: Mark the nodes as part of the core set
+        :return: The queried nodes, in the order of the given bibcodes
+        """
+        articles = query_articles(bibcodes, progress=False)
+        return [Node(db_article=articles[bibcode], judgement=judgement) for bibcode in bibcodes]
 
     @property
     def modularity_id(self) -> int:
@@ -66,25 +291,28 @@ class Node:
 
     @property
     def authors(self) -> str:
-        author_list = self._article.author
-        try:
-            return '; '.join(author_list)
-        except TypeError:
-            return 'N/A'
+        if self._authors is None:
+            author_list = self._article.author
+            try:
+                self._authors = '; '.join(author_list)
+            except TypeError:
+                self._authors = 'N/A'
+        return self._authors
 
     @property
     def title(self) -> str:
-        title_list = self._article.title
-        try:
-            return '; '.join(title_list)
-        except TypeError:
-            return 'N/A'
+        if self._title is None:
+            title_list = self._article.title
+            try:
+                self._title = '; '.join(title_list)
+            except TypeError:
+                self._title = 'N/A'
+        return self._title
 
     @property
     def reference_nodes(self) -> Iterable:
         if self._article.reference:
-            for bibcode in self._article.reference:
-                yield Node(bibcode=bibcode)
+            yield from Node.fetch_many(self._article.reference)
         return []
 
     @property
@@ -94,8 +322,7 @@ class Node:
     @property
     def citation_nodes(self) -> Iterable:
         if self._article.citation:
-            for bibcode in self._article.citation:
-                yield Node(bibcode=bibcode)
+            yield from Node.fetch_many(self._article.citation)
         return []
 
     @property
@@ -107,10 +334,19 @@ class CitationNetwork:
     """
     A citation network composed of nodes and edges
     """
+    __slots__ = ('article_cache', '_nodes', '_edges', '_node_index', '_edge_set')
 
-    def __init__(self):
+    def __init__(self, article_cache: 'ArticleCache' = None):
+        """
+        Create an empty citation network
+        :param article_cache: Cache for ADS responses, used while sampling
+        """
+        self.article_cache = article_cache
         self._nodes: List['Node'] = []
         self._edges: List[Tuple] = []
+        # Hash indices kept in sync with the lists above for O(1) lookups
+        self._node_index: Dict[str, 'Node'] = {}
+        self._edge_set: Set[Tuple[str, str]] = set()
 
     def __len__(self):
         return len(self.nodes)
@@ -122,6 +358,14 @@ class CitationNetwork:
         """
         return self._nodes
 
+    @property
+    def bibcodes(self) -> KeysView[str]:
+        """
+        Get the bibcodes of the nodes in the network
+        :return: A set-like live view on the node index
+        """
+        return self._node_index.keys()
+
     @property
     def edges(self) -> List[Tuple[str, str, int]]:
         """
@@ -138,6 +382,7 @@ class CitationNetwork:
         :param edges: A list of edges
         """
         self._edges = edges
+        self._edge_set = {edge[:2] for edge in edges}
 
     def add_node(self, bibcode: str = None, db_node: Node = None, judgement: bool = False) -> None:
         """
@@ -148,10 +393,9 @@ class CitationNetwork:
         bibcode = bibcode if bibcode else db_node.bibcode
         if self.has_node(bibcode):
             return
-        if bibcode:
-            self._nodes.append(Node(bibcode, judgement=judgement))
-        elif db_node:
-            self._nodes.append(db_node)
+        node = db_node if db_node else Node(bibcode, judgement=judgement)
+        self._nodes.append(node)
+        self._node_index[node.bibcode] = node
 
     def add_edge(self, edge: Tuple[str, str, int]) -> None:
         """
@@ -161,57 +405,55 @@ class CitationNetwork:
         if self.has_edge(edge):
             return
         self._edges.append(edge)
+        self._edge_set.add(edge[:2])
 
     def has_node(self, bibcode: str) -> bool:
         """
         Check if a node exists in the network by using its bibcode
         :param bibcode:
         """
-        for node in self._nodes:
-            if bibcode == node.bibcode:
-                return True
-        return False
+        return bibcode in self._node_index
 
     def get_node(self, bibcode: str) -> Node:
         """
         Returns the node with the provided bibcode, if it exists in the network
         :param bibcode:
         """
-        for node in self._nodes:
-            if bibcode == node.bibcode:
-                return node
+        return self._node_index.get(bibcode)
 
     def node_is_judgement(self, bibcode: str) -> bool:
         """
         Check if a node was added via judgement sampling
         :param bibcode:
         """
-        for node in self._nodes:
-            if bibcode == node.bibcode:
-                return node.judgement
+        node = self._node_index.get(bibcode)
+        if node:
+            return node.judgement
         raise ValueError(f"There is no node with bibcode {bibcode} in the sampled network.")
 
     def has_edge(self, edge: Tuple[str, str, int]) -> bool:
         """
         Check if an edge exists in the network.
-        The edge is a tuple containing (source_bibcode, target_bibcode, weight)
+        The edge is a tuple containing (source_bibcode, target_bibcode, weight),
+        only source and target are compared.
         :param edge: Edge as tuple (bibcode, bibcode, weight)
         """
-        for old_edge in self._edges:
-            if old_edge == edge:
-                return True
-        return False
+        return edge[:2] in self._edge_set
 
     def is_selfcitation(self, citing: str, cited: str) -> bool:
         """
         Check if a node is a self-citation
-        :param bibcode:
+        :param citing: Bibcode of the citing node
+        :param cited: Bibcode of the cited node
+        """
+        return self._is_selfcitation(self.get_node(citing), self.get_node(cited))
+
+    def _is_selfcitation(self, citing_node: Node, cited_node: Node) -> bool:
+        """
+        Check if the citing and the cited node share the same first author
+        :param citing_node:
+        :param cited_node:
         """
-        try:
-            citing_node = self.get_node(citing)
-            cited_node = self.get_node(cited)
-        except:
-            return False
         try:
             first_author_citing = citing_node.author_list[0]
             first_author_cited = cited_node.author_list[0]
@@ -225,11 +467,16 @@ class CitationNetwork:
 
     def sample_judgement(self, bibcodes: Iterable[str]) -> None:
         """
-        Sample a list of bibcodes
+        Sample a list of bibcodes, querying them from ADS concurrently
         :param bibcodes:
         """
-        for bibcode in bibcodes:
-            self.add_node(bibcode, judgement=True)
+        bibcodes = [
+            bibcode for bibcode in dict.fromkeys(bibcodes)
+            if not self.has_node(bibcode)
+        ]
+        # The CLI shows a spinner while the core set is loaded, so no progress bar here
+        for node in self._fetch_nodes(bibcodes, judgement=True, progress=False):
+            self.add_node(db_node=node)
 
     def sample_snowball(self, year_interval: Tuple[str, str], scope: str) -> None:
         """
@@ -238,95 +485,153 @@ class CitationNetwork:
         :param scope:
         """
         sampled_nodes = []
-        start_year = year_interval[0]
-        end_year = year_interval[1]
+        lower_bound, upper_bound = self._year_bounds(year_interval)
+        # Bibcodes which are already in the network or already sampled, so that
+        # a bibcode cited by several nodes is only queried once
+        known_bibcodes = set(self._node_index)
+        sample_citations = 'cit' in scope
+        sample_references = 'ref' in scope
         for node in self.nodes:
-            if 'cit' in scope:
-                sampled_nodes += [
-                    cit_bibcode for cit_bibcode in node.citation_bibcodes
-                    if start_year <= cit_bibcode[:4] <= end_year and
-                    not self.has_node(cit_bibcode)
-                ]
-            if 'ref' in scope:
-                sampled_nodes += [
-                    ref_bibcode for ref_bibcode in node.reference_bibcodes
-                    if start_year <= ref_bibcode[:4] <= end_year and
-                    not self.has_node(ref_bibcode)
-                ]
-
-        nodes = tqdm(sampled_nodes)
-        for bibcode in nodes:
-            nodes.set_description(f'Processing {bibcode}')
-            self.add_node(bibcode)
+            adjacent_bibcodes = chain(
+                node.citation_bibcodes if sample_citations else (),
+                node.reference_bibcodes if sample_references else ()
+            )
+            for bibcode in adjacent_bibcodes:
+                if bibcode not in known_bibcodes and lower_bound <= bibcode < upper_bound:
+                    known_bibcodes.add(bibcode)
+                    sampled_nodes.append(bibcode)
+
+        for node in self._fetch_nodes(sampled_nodes):
+            self.add_node(db_node=node)
+
+    @staticmethod
+    def _year_bounds(year_interval: Tuple[str, str]) -> Tuple[str, str]:
+        """
+        Turn a year interval into bounds which can be compared with whole bibcodes.
+        Bibcodes start with the four digit publication year, so a bibcode was published
+        within the interval if lower_bound <= bibcode < upper_bound, which spares slicing
+        the year out of every single candidate bibcode. The years are compared as strings,
+        exactly like start_year <= bibcode[:4] <= end_year (so e.g. an end year of 9999
+        keeps every bibcode): any bibcode whose year is at most end_year sorts below
+        end_year followed by the highest code point.
+        :param year_interval: Start and end year, both inclusive
+        :return: Tuple of (lower_bound, upper_bound)
+        """
+        start_year, end_year = year_interval
+        if len(start_year) > 4:
+            # No four character year equals such a start year, only greater ones pass
+            start_year = start_year[:4] + '\uffff'
+        if len(end_year) >= 4:
+            end_year = end_year[:4] + '\uffff'
+        return start_year, end_year
+
+    def _fetch_nodes(self, bibcodes: List[str], judgement: bool = False, progress: bool = True) -> List[Node]:
+        """
+        Query nodes from ADS in bulk. Articles found in the article
+        cache are not queried again.
+        :param bibcodes: Bibcodes to be queried from ADS
+        :param judgement: Mark the queried nodes as part of the core set
+        :param progress: Show a progress bar while querying ADS
+        :return: The queried nodes, in the order of the given bibcodes
+        """
+        articles = self.article_cache.get_articles(bibcodes) if self.article_cache else {}
+        queried_articles = query_articles(
+            [bibcode for bibcode in bibcodes if bibcode not in articles], progress=progress
+        )
+        if self.article_cache:
+            self.article_cache.put_articles(queried_articles)
+        articles.update(queried_articles)
+        return [Node(db_article=articles[bibcode], judgement=judgement) for bibcode in bibcodes]
 
     @staticmethod
     def author_is_same(name_1: str, name_2: str) -> bool:
         """
         Assess if two author names are similar enough to refer to the same person
         by doing a fuzzy string comparison using the Ratcliff/Obershelp algorithm.
+        Results are memoized, since the same pair of authors is compared
+        for every edge between their publications.
         TODO: Improve precision, check more edge cases
         :param name_1
         :param name_2
         """
-        name1_last, name1_first = tuple(name_1.split(', '))
-        name2_last, name2_first = tuple(name_2.split(', '))
-        name1_initial = name1_first[0]
-        name2_initial = name2_first[0]
-        if name1_initial != name2_initial:
-            return False
-        score = (
-             SequenceMatcher(None, name1_initial, name2_initial).ratio() +
-             SequenceMatcher(None, name1_last, name2_last).ratio() * 9
-        ) / 10.0
-        if score > 0.80:
-            return True
-        return False
+        return _author_is_same(name_1, name_2)
+
+    @staticmethod
+    def batch_author_similarity(author_names: List[str]) -> List[List[bool]]:
+        """
+        Assess for every pair of author names if they refer to the same person,
+        using the same comparison as author_is_same. Names are split only once
+        and only names sharing their first initial are compared at all.
+        :param author_names: List of names formatted as 'Last, First'
+        :return: Matrix whose entry [i][j] is True if names i and j refer to the same person
+        """
+        matrix = [[False] * len(author_names) for _ in author_names]
+        positions_by_initial: Dict[str, List[int]] = defaultdict(list)
+        for position, name in enumerate(author_names):
+            positions_by_initial[_split_name(name)[1]].append(position)
+        for positions in positions_by_initial.values():
+            for i in positions:
+                for j in positions:
+                    matrix[i][j] = _author_is_same(author_names[i], author_names[j])
+        return matrix
 
     def make_regular_edges(self, remove_selfcitations: bool) -> None:
         """
         Generate edges pointing from citing to cited node
         """
-        for node in self._nodes:
-            adjacent_nodes_cit = [
-                (adjacent_node_bibcode, node.bibcode, 0)
-                for adjacent_node_bibcode in node.citation_bibcodes
-                if self.has_node(adjacent_node_bibcode)
-            ]
-            adjacent_nodes_ref = [
-                (node.bibcode, adjacent_node_bibcode, 0)
-                for adjacent_node_bibcode in node.reference_bibcodes
-                if self.has_node(adjacent_node_bibcode)
-            ]
-            if remove_selfcitations:
-                adjacent_nodes_cit = [e for e in adjacent_nodes_cit if not self.is_selfcitation(e[0], e[1])]
-                adjacent_nodes_ref = [e for e in adjacent_nodes_ref if not self.is_selfcitation(e[0], e[1])]
-            any(
-                self.add_edge(edge)
-                for edge in [*adjacent_nodes_cit, *adjacent_nodes_ref]
-            )
+        self._make_regular_edges(remove_selfcitations, coreset_focus=False)
 
     def make_regular_edges_coreset_focus(self, remove_selfcitations: bool) -> None:
         """
         Generate edges pointing from citing to cited node, where citing nodes have to be part of the core set
         """
+        self._make_regular_edges(remove_selfcitations, coreset_focus=True)
+
+    def _make_regular_edges(self, remove_selfcitations: bool, coreset_focus: bool) -> None:
+        """
+        Generate edges pointing from citing to cited node.
+        Every adjacent node is looked up only once and reused for all checks.
+        """
         for node in self._nodes:
-            adjacent_nodes_cit = [
-                (adjacent_node_bibcode, node.bibcode, 0)
-                for adjacent_node_bibcode in node.citation_bibcodes
-                if self.has_node(adjacent_node_bibcode) and self.node_is_judgement(adjacent_node_bibcode)
-            ]
-            adjacent_nodes_ref = [
-                (node.bibcode, adjacent_node_bibcode, 0)
-                for adjacent_node_bibcode in node.reference_bibcodes
-                if self.has_node(adjacent_node_bibcode) and node.judgement
-            ]
-            if remove_selfcitations:
-                adjacent_nodes_cit = [e for e in adjacent_nodes_cit if not self.is_selfcitation(e[0], e[1])]
-                adjacent_nodes_ref = [e for e in adjacent_nodes_ref if not self.is_selfcitation(e[0], e[1])]
-            any(
-                self.add_edge(edge)
-                for edge in [*adjacent_nodes_cit, *adjacent_nodes_ref]
-            )
+            for adjacent_node_bibcode in node.citation_bibcodes:
+                adjacent_node = self.get_node(adjacent_node_bibcode)
+                if self._is_valid_edge(adjacent_node, node, remove_selfcitations, coreset_focus):
+                    self.add_edge((adjacent_node_bibcode, node.bibcode, 0))
+            for adjacent_node_bibcode in node.reference_bibcodes:
+                adjacent_node = self.get_node(adjacent_node_bibcode)
+                if self._is_valid_edge(node, adjacent_node, remove_selfcitations, coreset_focus):
+                    self.add_edge((node.bibcode, adjacent_node_bibcode, 0))
+
+    def _is_valid_edge(self, citing_node: Node, cited_node: Node,
+                       remove_selfcitations: bool, coreset_focus: bool) -> bool:
+        """
+        Check if an edge from citing to cited node should be part of the network
+        :param citing_node: Citing node, None if it is not part of the network
+        :param cited_node: Cited node, None if it is not part of the network
+        :param remove_selfcitations: Reject edges between nodes with the same first author
+        :param coreset_focus: Reject edges whose citing node is not part of the core set
+        """
+        if citing_node is None or cited_node is None:
+            return False
+        if coreset_focus and not citing_node.judgement:
+            return False
+        if remove_selfcitations and self._is_selfcitation(citing_node, cited_node):
+            return False
+        return True
+
+    def _as_graph(self) -> 'Graph':
+        """
+        Build a directed igraph Graph of the network in a single constructor call,
+        using the node positions as integer vertex IDs instead of bibcode names
+        """
+        # igraph is only needed for modularity, so runs without it skip loading the C extension
+        from igraph import Graph
+        vertex_ids = {node.bibcode: vertex_id for vertex_id, node in enumerate(self._nodes)}
+        edges = [
+            (vertex_ids[edge[0]], vertex_ids[edge[1]])
+            for edge in self._edges
+        ]
+        return Graph(n=len(self._nodes), edges=edges, directed=True)
 
     def make_semsim_edges(self, measure, coreset_focus=False, remove_selfcitations=False) -> None:
         """
@@ -339,50 +644,42 @@ class CitationNetwork:
             self.make_regular_edges_coreset_focus(remove_selfcitations)
         else:
             self.make_regular_edges(remove_selfcitations)
-        graph = Graph(directed=True)
-        vertices = [node.bibcode for node in self.nodes]
-        graph.add_vertices(vertices)
-        regular_edges = [
-            (edge[0], edge[1])
-            for edge in self.edges
-        ]
-        graph.add_edges(regular_edges)
+        # Group the nodes by the node they share: co-cited nodes share a citing node,
+        # bibliographically coupled nodes share a cited node
+        shared_nodes: Dict[str, List[str]] = defaultdict(list)
         if measure == 'cocit':
-            matrix = graph.cocitation()
+            for citing, cited, _ in self._edges:
+                shared_nodes[citing].append(cited)
         elif measure == 'bibcp':
-            matrix = graph.bibcoupling()
+            for citing, cited, _ in self._edges:
+                shared_nodes[cited].append(citing)
         else:
             raise ValueError('Measure type not valid.')
-        semsim_edges = []
-        for i1, v1 in enumerate(matrix):
-            for i2, v2 in enumerate(matrix):
-                if matrix[i1][i2] > 0:
-                    index = matrix[i1][i2]
-                    if (vertices[i1], vertices[i2], index) not in semsim_edges:
-                        semsim_edges.append((vertices[i1], vertices[i2], index))
-        self._edges = semsim_edges
+        # Only pairs within a group get a weight, so this is linear in the number of
+        # resulting edges instead of building the dense V x V similarity matrix
+        weights: Dict[str, Counter] = defaultdict(Counter)
+        for group in shared_nodes.values():
+            for bibcode_1, bibcode_2 in combinations(group, 2):
+                if bibcode_1 != bibcode_2:
+                    weights[bibcode_1][bibcode_2] += 1
+                    weights[bibcode_2][bibcode_1] += 1
+        # Keep the row-major order of the similarity matrix
+        node_positions = {node.bibcode: position for position, node in enumerate(self._nodes)}
+        self.edges = [
+            (node.bibcode, bibcode, weight)
+            for node in self._nodes
+            for bibcode, weight in sorted(weights[node.bibcode].items(), key=lambda item: node_positions[item[0]])
+        ]
 
     def assign_modularity(self) -> None:
         """
         Assign modularity to nodes using the community infomap algorithm
         """
-        graph = Graph(directed=True)
-        vertices = [node.bibcode for node in self.nodes]
-        graph.add_vertices(vertices)
-        edges = [
-            (edge[0], edge[1])
-            for edge in self.edges
-        ]
-        graph.add_edges(edges)
-        modularity = {
-            vertices[node_index]: module_id
-            for module_id, module in enumerate(
-                graph.community_infomap(trials=1)
-            )
-            for node_index in module
-        }
-        for node in self._nodes:
-            node.modularity_id = modularity[node.bibcode]
+        graph = self._as_graph()
+        # Vertex IDs are the node positions, so the membership list lines up with the nodes
+        membership = graph.community_infomap(trials=1).membership
+        for node, module_id in zip(self._nodes, membership):
+            node.modularity_id = module_id
 
 
 class Database:
@@ -420,7 +717,16 @@ class Database:
             Column('target', String(20)),
             Column('weight', Integer)
         )
+        # Lets SQLite skip edges which are already stored (INSERT OR IGNORE)
+        edges_index = Index('ux_edges_source_target', self._edges.c.source, self._edges.c.target, unique=True)
         self._metadata.create_all(self._engine)
+        # Databases created by earlier versions don't have the index yet and may hold
+        # duplicate edges, which have to go before the index can be created
+        if edges_index.name not in {index['name'] for index in inspect(self._engine).get_indexes('edges')}:
+            first_edge_ids = select([func.min(self._edges.c.id)]).group_by(self._edges.c.source, self._edges.c.target)
+            with self._conn.begin():
+                self._conn.execute(self._edges.delete().where(self._edges.c.id.notin_(first_edge_ids)))
+                edges_index.create(self._conn)
         self.citnet = CitationNetwork()
 
     def node_in_db(self, bibcode: str) -> bool:
@@ -428,84 +734,189 @@ class Database:
         Check by bibcode if node already exists in db
         :param bibcode:
         """
-        db_nodes = self._conn.execute(
-            select([self._nodes])
-        )
-        for node in db_nodes:
-            if bibcode == node.id:
-                return True
-        return False
+        db_node = self._conn.execute(
+            select([self._nodes.c.id]).where(self._nodes.c.id == bibcode)
+        ).first()
+        return db_node is not None
 
     def edge_in_db(self, edge: Tuple[str, str, int]) -> bool:
         """
-        Check by bibcode if node already exists in db
+        Check by source and target bibcode if edge already exists in db
         :param edge: Edge as tuple (bibcode, bibcode, weight)
         """
-        db_edges = self._conn.execute(
-            select([self._edges])
-        )
-        for db_edge in db_edges:
-            if db_edge[1:3] == edge[:2]:
-                return True
-        return False
+        db_edge = self._conn.execute(
+            select([self._edges.c.id]).where(
+                (self._edges.c.source == edge[0]) & (self._edges.c.target == edge[1])
+            )
+        ).first()
+        return db_edge is not None
+
+    def get_cluster_ids(self, bibcodes: List[str]) -> Dict[str, int]:
+        """
+        Look up the cluster IDs of nodes in the db, using one SELECT per chunk of bibcodes
+        :param bibcodes:
+        :return: Dict mapping the bibcodes found in the db to their cluster ID
+        """
+        cluster_ids = {}
+        for bibcodes_chunk in sqlite_chunks(bibcodes):
+            db_nodes = self._conn.execute(
+                select([self._nodes.c.id, self._nodes.c.cluster_id]).where(self._nodes.c.id.in_(bibcodes_chunk))
+            )
+            cluster_ids.update((db_node.id, db_node.cluster_id) for db_node in db_nodes)
+        return cluster_ids
 
     def write_citnet_to_db(self) -> None:
         """
-        Map and save citation network from CitationNetwork object to db
+        Map and save citation network from CitationNetwork object to db.
+        All new rows are inserted with a single executemany in one transaction,
+        letting SQLite skip edges which are already stored.
+        Nodes which are already stored only get their cluster ID updated.
         """
+        db_clusters = self.get_cluster_ids(list(self.citnet.bibcodes))
+        node_rows = []
+        cluster_rows = []
         for node in self.citnet.nodes:
-            if not self.node_in_db(node.bibcode):
-                insertion = self._nodes.insert().values(
-                    id=node.bibcode,
-                    author=node.authors,
-                    title=node.title,
-                    start=node.year, end=node.year,
-                    ordervar=(int(node.year) - 1900) / 100,
-                    citation='; '.join(node.citation_bibcodes),
-                    reference='; '.join(node.reference_bibcodes),
-                    cluster_id=node.modularity_id,
-                    judgement=str(node.judgement)
-                )
-                self._conn.execute(insertion)
-        for edge in self.citnet.edges:
-            # This filters out edges whose target node doesn't belong to the judgement sample
-            # TODO: Consider making this an option to be toggled from the CLI
-            if not self.edge_in_db(edge):
-                insertion = self._edges.insert().values(
-                    source=edge[0],
-                    target=edge[1],
-                    weight=edge[2]
+            if node.bibcode in db_clusters:
+                if db_clusters[node.bibcode] != node.modularity_id:
+                    cluster_rows.append({'node_id': node.bibcode, 'cluster_id': node.modularity_id})
+                continue
+            db_clusters[node.bibcode] = node.modularity_id
+            node_rows.append({
+                'id': node.bibcode,
+                'author': node.authors,
+                'title': node.title,
+                'start': node.year,
+                'end': node.year,
+                'ordervar': (int(node.year) - 1900) / 100,
+                'citation': '; '.join(node.citation_bibcodes),
+                'reference': '; '.join(node.reference_bibcodes),
+                'cluster_id': node.modularity_id,
+                'judgement': str(node.judgement)
+            })
+        # This filters out edges whose target node doesn't belong to the judgement sample
+        # TODO: Consider making this an option to be toggled from the CLI
+        edge_rows = [
+            {'source': edge[0], 'target': edge[1], 'weight': edge[2]}
+            for edge in self.citnet.edges
+        ]
+        with self._conn.begin():
+            if node_rows:
+                self._conn.execute(self._nodes.insert().prefix_with('OR IGNORE'), node_rows)
+            if cluster_rows:
+                self._conn.execute(
+                    self._nodes.update()
+                    .where(self._nodes.c.id == bindparam('node_id'))
+                    .values(cluster_id=bindparam('cluster_id')),
+                    cluster_rows
                 )
-                self._conn.execute(insertion)
+            if edge_rows:
+                self._conn.execute(self._edges.insert().prefix_with('OR IGNORE'), edge_rows)
 
     def read_citnet_from_db(self) -> None:
         """
-        Map and load citation network from db to CitationNetwork object
+        Map and load citation network from db to CitationNetwork object.
+        Only the columns needed to rebuild the network are selected.
         """
+        nodes = self._nodes.c
         db_nodes = self._conn.execute(
-            select([self._nodes])
+            select([
+                nodes.id, nodes.title, nodes.start, nodes.author,
+                nodes.citation, nodes.reference, nodes.cluster_id, nodes.judgement
+            ])
         )
-        db_edges = self._conn.execute(
-            select([self._edges])
-        )
-        citnet_nodes = []
-        ArticleStub = namedtuple('ArticleStub', ['bibcode', 'title', 'year', 'author', 'citation', 'reference'])
         for db_node in db_nodes:
             article = ArticleStub(
-                bibcode=db_node.id,
+                bibcode=sys.intern(db_node.id),
                 title=[db_node.title],
                 year=db_node.start,
-                author=db_node.author.split('; '),
-                citation=db_node.citation.split('; '),
-                reference=db_node.reference.split('; ')
+                author=db_node.author.split('; ') if db_node.author else [],
+                citation=split_bibcodes(db_node.citation),
+                reference=split_bibcodes(db_node.reference)
             )
             judgement = db_node.judgement == 'True'
             citnet_node = Node(db_article=article, judgement=judgement)
             citnet_node.modularity_id = db_node.cluster_id
-            citnet_nodes.append(citnet_node)
             self.citnet.add_node(db_node=citnet_node, judgement=judgement)
+        db_edges = self._conn.execute(
+            select([self._edges.c.source, self._edges.c.target, self._edges.c.weight])
+        )
         for db_edge in db_edges:
             self.citnet.add_edge(
-                (db_edge.source, db_edge.target, db_edge.weight)
+                (sys.intern(db_edge.source), sys.intern(db_edge.target), db_edge.weight)
             )
 
+    def close(self) -> None:
+        """
+        Close the db connection, so the file is released for other programs like Gephi
+        """
+        self._conn.close()
+        self._engine.dispose()
+
+
+class ArticleCache:
+    """
+    SQLite database caching ADS responses across runs
+    """
+
+    def __init__(self, path: str, max_age: float = ADS_CACHE_MAX_AGE):
+        """
+        Initialize a SQLite database for cached ADS articles
+        :param path: Path where the cache will be saved
+        :param max_age: Number of seconds after which a cached article expires
+        """
+        self._engine = create_engine(f'sqlite:///{path}')
+        self._conn = self._engine.connect()
+        self._metadata = MetaData()
+        self._articles = Table(
+            'articles',
+            self._metadata,
+            Column('bibcode', String(20), primary_key=True),
+            Column('fields', Text),
+            Column('fetched_at', Float)
+        )
+        self._metadata.create_all(self._engine)
+        self._max_age = max_age
+
+    def get_articles(self, bibcodes: List[str]) -> Dict[str, ads.search.Article]:
+        """
+        Look up cached articles which have not expired yet
+        :param bibcodes: Bibcodes the articles were queried with
+        :return: Dict mapping the bibcodes found in the cache to their articles
+        """
+        min_fetched_at = time.time() - self._max_age
+        articles = {}
+        for bibcodes_chunk in sqlite_chunks(bibcodes):
+            db_articles = self._conn.execute(
+                select([self._articles.c.bibcode, self._articles.c.fields]).where(
+                    self._articles.c.bibcode.in_(bibcodes_chunk) &
+                    (self._articles.c.fetched_at >= min_fetched_at)
+                )
+            )
+            for db_article in db_articles:
+                articles[db_article.bibcode] = ads.search.Article(**json.loads(db_article.fields))
+        return articles
+
+    def put_articles(self, articles: Dict[str, ads.search.Article]) -> None:
+        """
+        Save queried articles to the cache, replacing expired entries
+        :param articles: Dict mapping the bibcodes the articles were queried with to the articles
+        """
+        fetched_at = time.time()
+        rows = [
+            {
+                'bibcode': bibcode,
+                'fields': json.dumps({field: getattr(article, field) for field in ADS_FIELDS}),
+                'fetched_at': fetched_at
+            }
+            for bibcode, article in articles.items()
+        ]
+        if rows:
+            with self._conn.begin():
+                self._conn.execute(self._articles.insert().prefix_with('OR REPLACE'), rows)
+
+    def close(self) -> None:
+        """
+        Close the cache's db connection
+        """
+        self._conn.close()
+        self._engine.dispose()
@@ -1,11 +1,41 @@
 import os
 import sys
 import click
-from ads import SearchQuery
-from ads.base import APIResponseError
-from configparser import ConfigParser
+from contextlib import contextmanager
 from yaspin import yaspin
 
+# Configuration location, the same as read by ads2gephi.ads2gephi
+home_dir = os.path.expanduser('~')
+conf_dir_path = os.path.join(home_dir, '.ads2gephi')
+conf_file_path = os.path.join(conf_dir_path, 'ads2gephi.cfg')
+
+SNOWBALL_SAMPLER_MESSAGES = {
+    'cit': 'Starting snowball sampling based on citation metadata',
+    'ref': 'Starting snowball sampling based on reference metadata',
+    'cit+ref': 'Starting snowball sampling based on citation and reference metadata'
+}
+EDGE_GENERATOR_MESSAGES = {
+    'citnet': 'Starting edge generator with regular citation network values',
+    'cocit': 'Starting edge generator with co-citation values',
+    'bibcp': 'Starting edge generator with bibliographic coupling values'
+}
+
+
+@contextmanager
+def phase(text: str):
+    """
+    Show a spinner while a processing phase runs. If stdout is not a terminal
+    (e.g. redirected to a log), only the phase description is printed.
+    :param text: Description of the phase
+    """
+    if sys.stdout.isatty():
+        with yaspin(text=text) as spinner:
+            yield
+            spinner.ok(u'\u2713')
+    else:
+        print(text)
+        yield
+
 
 @click.command()
 @click.version_option(version='0.3.8')
@@ -46,12 +76,15 @@ from yaspin import yaspin
     is_flag=True,
     help='Filter out edges whose citing node is a self-citation (currently only applied in co-citation network)'
 )
-def main(coreset_sampler, snowball_sampler, edge_generator, database, modularity, coreset_focus, remove_selfcitations):
+@click.option(
+    '--no-cache',
+    is_flag=True,
+    help='Query all publications from ADS instead of reusing the responses cached during earlier runs.'
+)
+def main(coreset_sampler, snowball_sampler, edge_generator, database, modularity, coreset_focus, remove_selfcitations,
+         no_cache):
 
     # CONFIGURATION
-    home_dir = os.path.expanduser('~')
-    conf_dir_path = os.path.join(home_dir, '.ads2gephi')
-    conf_file_path = os.path.join(conf_dir_path, 'ads2gephi.cfg')
     if os.path.isfile(conf_file_path):
         print(f'Found configuration file: {conf_file_path}')
     else:
@@ -63,10 +96,16 @@ def main(coreset_sampler, snowball_sampler, edge_generator, database, modularity
         start_year = click.prompt('Start year', type=str, default='1900')
         end_year = click.prompt('End year', type=str, default='2000')
         os.makedirs(conf_dir_path, exist_ok=True)
+        # The ADS client is only needed to validate a new key
+        from ads import SearchQuery
+        from ads.base import APIResponseError
         try:
+            # Only the bibcode is requested, the query merely has to be accepted
             SearchQuery(
                 bibcode='1968IAUS...29...11A',
-                token=key_input
+                token=key_input,
+                fl=['bibcode'],
+                rows=1
             ).next()
         except APIResponseError as error:
             click.secho('[ERROR]', fg='red', bold=True)
@@ -82,94 +121,65 @@ def main(coreset_sampler, snowball_sampler, edge_generator, database, modularity
             print(f'Default year interval for snowball sampling '
                   f'has been set to {start_year}-{end_year}.')
 
-    config = ConfigParser()
-    config.read_file(open(conf_file_path))
+    # Imported only now, since the module reads the API key from the configuration file
+    from ads2gephi.ads2gephi import Database, ArticleCache, load_config
+
+    config = load_config(conf_file_path)
     config_start_year = config['snowball_default_interval']['StartYear']
     config_end_year = config['snowball_default_interval']['EndYear']
 
-    from ads2gephi.ads2gephi import Database
-
     # DATA PROCESSING
     loading_message = f'Loading database from {database}'
-    with yaspin(text=loading_message) as spinner:
+    with phase(loading_message):
         db = Database(database)
         db.read_citnet_from_db()
         citnet = db.citnet
-        spinner.ok(u'\u2713')
+        if not no_cache:
+            citnet.article_cache = ArticleCache(os.path.join(conf_dir_path, 'ads_cache.db'))
     if coreset_sampler:
         loading_message = f'Sampling nodes from ' \
                           f'bibcodes provided in {coreset_sampler.name}'
-        with yaspin(text=loading_message) as spinner:
+        with phase(loading_message):
             with coreset_sampler as file:
+                # Seed lists are often concatenated, so drop repeated bibcodes but keep their order
                 citnet.sample_judgement(
-                    [line for line in file]
+                    list(dict.fromkeys(line.strip() for line in file.read().splitlines() if line.strip()))
                 )
-            spinner.ok(u'\u2713')
-    if snowball_sampler == 'cit':
-        print('Starting snowball sampling based on citation metadata')
-        citnet.sample_snowball(
-            year_interval=(config_start_year, config_end_year),
-            scope='cit'
-        )
-    elif snowball_sampler == 'ref':
-        print('Starting snowball sampling based on reference metadata')
-        citnet.sample_snowball(
-            year_interval=(config_start_year, config_end_year),
-            scope='ref'
-        )
-    elif snowball_sampler == 'cit+ref':
-        print('Starting snowball sampling based on citation and reference metadata')
+    if snowball_sampler:
+        print(SNOWBALL_SAMPLER_MESSAGES[snowball_sampler])
         citnet.sample_snowball(
             year_interval=(config_start_year, config_end_year),
-            scope='cit+ref'
+            scope=snowball_sampler
         )
-    if edge_generator == 'citnet':
-        if coreset_focus:
-            loading_message = 'Starting edge generator with regular citation network values focused on core set'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_regular_edges_coreset_focus(remove_selfcitations)
-                spinner.ok(u'\u2713')
-        else:
-            loading_message = 'Starting edge generator with regular citation network values'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_regular_edges(remove_selfcitations)
-                spinner.ok(u'\u2713')
-    elif edge_generator == 'cocit':
+    if edge_generator:
+        edge_generators = {
+            'citnet': lambda: (
+                citnet.make_regular_edges_coreset_focus(remove_selfcitations) if coreset_focus
+                else citnet.make_regular_edges(remove_selfcitations)
+            ),
+            'cocit': lambda: citnet.make_semsim_edges(
+                'cocit', coreset_focus=coreset_focus, remove_selfcitations=remove_selfcitations
+            ),
+            'bibcp': lambda: citnet.make_semsim_edges('bibcp', coreset_focus=coreset_focus)
+        }
+        loading_message = EDGE_GENERATOR_MESSAGES[edge_generator]
         if coreset_focus:
-            loading_message = 'Starting edge generator with co-citation values focused on core set'
-            if remove_selfcitations:
-                loading_message += ' (removing self-citations)'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_semsim_edges('cocit', coreset_focus=True, remove_selfcitations=remove_selfcitations)
-                spinner.ok(u'\u2713')
-        else:
-            loading_message = 'Starting edge generator with co-citation values'
-            if remove_selfcitations:
-                loading_message += ' (removing self-citations)'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_semsim_edges('cocit', remove_selfcitations=remove_selfcitations)
-                spinner.ok(u'\u2713')
-    elif edge_generator == 'bibcp':
-        if coreset_focus:
-            loading_message = 'Starting edge generator with bibliographic coupling values focused on core set'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_semsim_edges('bibcp', coreset_focus=True)
-                spinner.ok(u'\u2713')
-        else:
-            loading_message = 'Starting edge generator with bibliographic coupling values'
-            with yaspin(text=loading_message) as spinner:
-                citnet.make_semsim_edges('bibcp')
-                spinner.ok(u'\u2713')
+            loading_message += ' focused on core set'
+        if remove_selfcitations and edge_generator == 'cocit':
+            loading_message += ' (removing self-citations)'
+        with phase(loading_message):
+            edge_generators[edge_generator]()
     if modularity:
         loading_message = 'Initiating modularity assignment'
-        with yaspin(text=loading_message) as spinner:
+        with phase(loading_message):
             citnet.assign_modularity()
-            spinner.ok(u'\u2713')
 
     loading_message = f'Writing citation network to {database}'
-    with yaspin(text=loading_message) as spinner:
+    with phase(loading_message):
         db.write_citnet_to_db()
-        spinner.ok(u'\u2713')
+        db.close()
+        if citnet.article_cache:
+            citnet.article_cache.close()
 
 
 if __name__ == '__main__':
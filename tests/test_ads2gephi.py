@@ -1,6 +1,9 @@
 import os
+import copy
+import sqlite3
 import pytest
-from ads2gephi.ads2gephi import Node, CitationNetwork, Database
+import ads
+from ads2gephi.ads2gephi import Node, CitationNetwork, Database, ArticleCache, ArticleStub
 
 TEST_NODE = {
     'bibcode': '1968IAUS...29...11A',
@@ -15,16 +18,25 @@ TEST_NODE = {
 }
 
 
-@pytest.fixture()
-def citnet():
+@pytest.fixture(scope='module')
+def sampled_citnet():
     """
-    Check if nodes added by judgement sampling are correct
+    Check if nodes added by judgement sampling are correct.
+    Sampled only once per module, since it queries ADS.
     """
     citnet = CitationNetwork()
     citnet.sample_judgement(bibcodes=[TEST_NODE['bibcode']])
     return citnet
 
 
+@pytest.fixture()
+def citnet(sampled_citnet):
+    """
+    Copy of the sampled network, so tests can modify it independently
+    """
+    return copy.deepcopy(sampled_citnet)
+
+
 def test_database_init():
     """
     Check if database file is created then initiating db object
@@ -48,11 +60,78 @@ def test_database_readwrite_citnet():
     os.remove(db_path)
 
 
+def test_database_write_citnet_updates_modularity():
+    """
+    Check if cluster IDs of nodes already stored in the db are updated
+    """
+    db_path = 'tests/ads2gephi_test.db'
+    db = Database(db_path)
+    article = ArticleStub(
+        bibcode=TEST_NODE['bibcode'], title=[TEST_NODE['title']], year=TEST_NODE['year'],
+        author=[TEST_NODE['authors']], citation=TEST_NODE['citation_bibcodes'],
+        reference=TEST_NODE['reference_bibcodes']
+    )
+    node = Node(db_article=article)
+    node.modularity_id = 0
+    db.citnet.add_node(db_node=node)
+    db.write_citnet_to_db()
+    node.modularity_id = 3
+    db.write_citnet_to_db()
+    reloaded_db = Database(db_path)
+    reloaded_db.read_citnet_from_db()
+    assert len(reloaded_db.citnet) == 1
+    assert reloaded_db.citnet.get_node(TEST_NODE['bibcode']).modularity_id == 3
+    os.remove(db_path)
+
+
+def test_database_init_removes_duplicate_edges():
+    """
+    Check if a db written by an earlier version, which could store the same edge twice,
+    can still be opened
+    """
+    db_path = 'tests/ads2gephi_test.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        'CREATE TABLE edges (id INTEGER NOT NULL, source VARCHAR(20), target VARCHAR(20), '
+        'weight INTEGER, PRIMARY KEY (id))'
+    )
+    conn.executemany('INSERT INTO edges (source, target, weight) VALUES (?, ?, ?)', [('a', 'b', 1)] * 2)
+    conn.commit()
+    conn.close()
+    db = Database(db_path)
+    db.read_citnet_from_db()
+    db.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT source, target, weight FROM edges').fetchall() == [('a', 'b', 1)]
+    conn.close()
+    os.remove(db_path)
+
+def test_article_cache_readwrite():
+    """
+    Check if cached articles are returned until they expire
+    """
+    cache_path = 'tests/ads2gephi_test_cache.db'
+    article = ads.search.Article(
+        bibcode=TEST_NODE['bibcode'], year=TEST_NODE['year'], title=[TEST_NODE['title']],
+        author=[TEST_NODE['authors']], citation=TEST_NODE['citation_bibcodes'],
+        reference=TEST_NODE['reference_bibcodes']
+    )
+    ArticleCache(cache_path).put_articles({TEST_NODE['bibcode']: article})
+    cached_articles = ArticleCache(cache_path).get_articles([TEST_NODE['bibcode'], '1963RvMP...35..947B'])
+    assert list(cached_articles) == [TEST_NODE['bibcode']]
+    node = Node(db_article=cached_articles[TEST_NODE['bibcode']])
+    assert node.title == TEST_NODE['title']
+    assert node.authors == TEST_NODE['authors']
+    assert node.citation_bibcodes == TEST_NODE['citation_bibcodes']
+    assert not ArticleCache(cache_path, max_age=-1).get_articles([TEST_NODE['bibcode']])
+    os.remove(cache_path)
+
+
 def test_citnet_sample_judgement(citnet):
     """
     Check if nodes added by judgement sampling are correct
     """
-    sampled_bibcodes = {node.bibcode for node in citnet.nodes}
+    sampled_bibcodes = citnet.bibcodes
     expected_bibcodes = {TEST_NODE['bibcode']}
     assert expected_bibcodes == sampled_bibcodes
 
@@ -62,7 +141,7 @@ def test_citnet_sample_snowball_cit(citnet):
     Check if nodes added by snowball sampling from citation are correct
     """
     citnet.sample_snowball(scope='cit', year_interval=('1975', '2012'))
-    sampled_bibcodes = {node.bibcode for node in citnet.nodes}
+    sampled_bibcodes = citnet.bibcodes
     expected_bibcodes = {
         TEST_NODE['bibcode'],
         *TEST_NODE['citation_bibcodes']
@@ -75,7 +154,7 @@ def test_citnet_sample_snowball_ref(citnet):
     Check if nodes added by snowball sampling from reference are correct
     """
     citnet.sample_snowball(scope='ref', year_interval=('1963', '2012'))
-    sampled_bibcodes = {node.bibcode for node in citnet.nodes}
+    sampled_bibcodes = citnet.bibcodes
     expected_bibcodes = {
         TEST_NODE['bibcode'],
         *TEST_NODE['reference_bibcodes']
@@ -89,7 +168,7 @@ def test_citnet_sample_snowball_citref(citnet):
     and reference are correct
     """
     citnet.sample_snowball(scope='cit+ref', year_interval=('1963', '2012'))
-    sampled_bibcodes = {node.bibcode for node in citnet.nodes}
+    sampled_bibcodes = citnet.bibcodes
     expected_bibcodes = {
         TEST_NODE['bibcode'],
         *TEST_NODE['citation_bibcodes'], *TEST_NODE['reference_bibcodes']
@@ -103,7 +182,7 @@ def test_citnet_sample_snowball_citref_years(citnet):
     and reference are correct with a year interval restraint
     """
     citnet.sample_snowball(scope='cit+ref', year_interval=('1963', '1975'))
-    sampled_bibcodes = {node.bibcode for node in citnet.nodes}
+    sampled_bibcodes = citnet.bibcodes
     expected_bibcodes = {
         TEST_NODE['bibcode'],
         '1963RvMP...35..947B', '1975NW.....62..309F'
@@ -111,6 +190,32 @@ def test_citnet_sample_snowball_citref_years(citnet):
     assert sampled_bibcodes == expected_bibcodes
 
 
+def test_citnet_sample_snowball_open_end_year(monkeypatch):
+    """
+    Check if an end year of 9999 restrains snowball sampling by the start year only
+    """
+    def query_articles(bibcodes, progress=True):
+        return {
+            bibcode: ArticleStub(
+                bibcode=bibcode, title=['N/A'], year=bibcode[:4], author=['N/A'], citation=[], reference=[]
+            )
+            for bibcode in bibcodes
+        }
+    monkeypatch.setattr('ads2gephi.ads2gephi.query_articles', query_articles)
+    citnet = CitationNetwork()
+    citnet.add_node(db_node=Node(db_article=ArticleStub(
+        bibcode=TEST_NODE['bibcode'], title=[TEST_NODE['title']], year=TEST_NODE['year'],
+        author=[TEST_NODE['authors']], citation=TEST_NODE['citation_bibcodes'],
+        reference=TEST_NODE['reference_bibcodes']
+    ), judgement=True))
+    citnet.sample_snowball(scope='cit+ref', year_interval=('1975', '9999'))
+    expected_bibcodes = {
+        TEST_NODE['bibcode'],
+        *TEST_NODE['citation_bibcodes']
+    }
+    assert citnet.bibcodes == expected_bibcodes
+
+
 def test_citnet_make_regular_edges(citnet):
     """
     Check if generated regular edges are correct
@@ -257,6 +362,19 @@ def test_citnet_author_identity_same():
     assert citnet.author_is_same('Ambarcuman, Viktor', 'Ambartsumian, V. A.')
 
 
+def test_citnet_batch_author_similarity():
+    """
+    Check if the batch author identity checker agrees with the pairwise one
+    """
+    names = ['Ambartsumyan, V.', 'Burbidge, X. Y.', 'Ambartsumian, V. A.', 'Burbidge, A. B.']
+    matrix = CitationNetwork.batch_author_similarity(names)
+    assert matrix == [
+        [CitationNetwork.author_is_same(name_1, name_2) for name_2 in names]
+        for name_1 in names
+    ]
+    assert matrix[0][2] and not matrix[1][3]
+
+
 def test_citnet_add_node():
     """
     Check if a node is added correctly